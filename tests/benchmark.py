@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+## Copyright(c) 2021 Yoann Robin
+## 
+## This file is part of CDSK.
+## 
+## CDSK is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 3 of the License, or
+## (at your option) any later version.
+## 
+## CDSK is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## 
+## You should have received a copy of the GNU General Public License
+## along with CDSK.  If not, see <https://www.gnu.org/licenses/>.
+
+
+###############
+## Libraries ##
+###############
+
+import sys,os
+import time
+import json
+import argparse
+import resource
+import multiprocessing as mp
+
+import numpy as np
+
+import CDSK as ck
+import CDSK.fractal as ckf
+
+
+###############
+## Functions ##
+###############
+
+def _peak_rss( conn , f , args , kwargs ):##{{{
+	base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	f( *args , **kwargs )
+	conn.send( { "base_rss_kB"          : base ,
+	             "peak_rss_kB"          : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss ,
+	             "peak_rss_children_kB" : resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss } )
+	conn.close()
+##}}}
+
+def peak_rss( f , *args , **kwargs ):##{{{
+	"""
+	Call f once in a fresh (forked) process and return the peak resident set
+	size (in kB, Linux) of this process and of its own workers. base_rss_kB is
+	the resident size inherited from the parent, before the call.
+	"""
+	ctx = mp.get_context("fork")
+	parent,child = ctx.Pipe( duplex = False )
+	proc = ctx.Process( target = _peak_rss , args = (child,f,args,kwargs) )
+	proc.start()
+	child.close()
+	rss = parent.recv()
+	proc.join()
+	return rss
+##}}}
+
+def measure( f , *args , n_repeat = 3 , warmup = False , **kwargs ):##{{{
+	"""
+	Time n_repeat calls of f, after one untimed warm-up call if warmup is
+	True (pool start-up, page faults). Return the wall-clock samples (in
+	seconds).
+	"""
+	if warmup:
+		f( *args , **kwargs )
+	
+	times = []
+	for _ in range(n_repeat):
+		t0 = time.perf_counter()
+		f( *args , **kwargs )
+		times.append( time.perf_counter() - t0 )
+	return times
+##}}}
+
+def label( rec ):##{{{
+	lab = rec["name"]
+	for k in ["n_jobs","ld_fit","pareto_fit"]:
+		if rec[k] is not None:
+			lab += ", {} = {}".format(k,rec[k])
+	return lab
+##}}}
+
+def key( rec ):##{{{
+	return ( rec["name"] , rec["n_jobs"] , rec["ld_fit"] , rec["pareto_fit"] )
+##}}}
+
+def record( records , case , f , *args , n_repeat = 3 , **kwargs ):##{{{
+	"""
+	Benchmark f( *args , **kwargs ) and append its record to records. case
+	is a dict with the keys name, sizes, work (units, i.e. steps x members,
+	points or pixels, done by one call) and unit, and optionally n_jobs,
+	ld_fit and pareto_fit. Cases with n_jobs > 1 get a warm-up call.
+	"""
+	rec = { "name" : case["name"] , "sizes" : case["sizes"] }
+	for k in ["n_jobs","ld_fit","pareto_fit"]:
+		rec[k] = case.get(k)
+	
+	rss   = peak_rss( f , *args , **kwargs )
+	times = measure( f , *args , n_repeat = n_repeat , warmup = rec["n_jobs"] is not None and rec["n_jobs"] > 1 , **kwargs )
+	rec.update( { "times" : times , "best" : min(times) ,
+	              "throughput" : case["work"] / min(times) , "throughput_unit" : case["unit"] } )
+	rec.update(rss)
+	rec["version"] = ck.__version__
+	records.append(rec)
+	
+	print( "{:<60}{:>10.3f} s{:>14.3g} {}".format( label(rec) , rec["best"] , rec["throughput"] , rec["throughput_unit"] ) )
+##}}}
+
+def bench_orbits( records , sizes = (1,2,4) , n_repeat = 3 ):##{{{
+	for scale in sizes:
+		n_step = 10000 * scale
+		
+		l63 = ck.Lorenz63()
+		record( records , { "name" : "Lorenz63 ({} steps)".format(n_step) , "sizes" : { "n_step" : n_step , "size" : 1 } ,
+		          "work" : n_step , "unit" : "steps/s" } ,
+		        l63.orbit , np.linspace( 0 , 100 , n_step ) , n_repeat = n_repeat )
+		
+		ross = ck.Rossler()
+		record( records , { "name" : "Rossler ({} steps)".format(n_step) , "sizes" : { "n_step" : n_step , "size" : 1 } ,
+		          "work" : n_step , "unit" : "steps/s" } ,
+		        ross.orbit , np.linspace( 0 , 300 , n_step ) , n_repeat = n_repeat )
+		
+		size = 1000 * scale
+		l84  = ck.Lorenz84( size = size , F = "cyclic" )
+		record( records , { "name" : "Lorenz84 cyclic ({} x 1000 steps)".format(size) , "sizes" : { "n_step" : 1000 , "size" : size } ,
+		          "work" : 1000 * size , "unit" : "steps.members/s" } ,
+		        l84.orbit , np.linspace( 0 , 73 , 1000 ) , n_repeat = n_repeat )
+		
+		henon = ck.Henon()
+		record( records , { "name" : "Henon ({} steps)".format(n_step) , "sizes" : { "n_step" : n_step , "size" : 1 } ,
+		          "work" : n_step , "unit" : "steps/s" } ,
+		        henon.orbit , n_step , X0 = np.array( [0.5,0.5] ) , n_repeat = n_repeat )
+		
+		ike = ck.Ikeda()
+		record( records , { "name" : "Ikeda ({} steps)".format(n_step) , "sizes" : { "n_step" : n_step , "size" : 1 } ,
+		          "work" : n_step , "unit" : "steps/s" } ,
+		        ike.orbit , n_step , X0 = np.array( [0.5,0.5] ) , n_repeat = n_repeat )
+		
+		mir = ck.Mira()
+		Y0  = mir.orbit( n_step , X0 = np.array( [0.5,0.5] ) )
+		mir = ck.Mira( size = n_step )
+		record( records , { "name" : "Mira ({} x 1000 steps)".format(n_step) , "sizes" : { "n_step" : 1000 , "size" : n_step } ,
+		          "work" : 1000 * n_step , "unit" : "steps.members/s" } ,
+		        mir.orbit , 1000 , X0 = Y0 , n_repeat = n_repeat )
+##}}}
+
+def bench_local_dimension( records , sizes = (1,2,4) , l_n_jobs = (1,2,6) , l_ld_fit = ("mean","SDFC") , n_repeat = 1 ):##{{{
+	for scale in sizes:
+		l63 = ck.Lorenz63()
+		X0  = l63.orbit( np.linspace( 0 , 100 , 100 ) )[-1,:]
+		X   = l63.orbit( np.linspace( 0 , 100 , 5000 * scale ) , X0 = X0 )
+		
+		l63 = ck.Lorenz63( size = 1000 )
+		XX  = l63.orbit( np.linspace( 0 , 100 , 1000 ) )[-1,:,:]
+		l63 = ck.Lorenz63()
+		Y   = l63.orbit( np.linspace( 0 , 100 , 20000 * scale ) , X0 = X0 )
+		
+		for n_jobs in l_n_jobs:
+			## localDimension takes the Pareto fit of figures.py, not ld_fit
+			record( records , { "name" : "localDimension ({})".format(X.shape[0]) , "sizes" : { "n_query" : X.shape[0] , "n_ref" : X.shape[0] } ,
+			          "work" : X.shape[0] , "unit" : "points/s" , "n_jobs" : n_jobs , "pareto_fit" : "SDFC" } ,
+			        ck.localDimension , X , n_jobs = n_jobs , pareto_fit = "SDFC" , n_repeat = n_repeat )
+			
+			for ld_fit in l_ld_fit:
+				record( records , { "name" : "dynamical_local_indexes ({} x {})".format(XX.shape[0],Y.shape[0]) , "sizes" : { "n_query" : XX.shape[0] , "n_ref" : Y.shape[0] } ,
+				          "work" : XX.shape[0] , "unit" : "points/s" , "n_jobs" : n_jobs , "ld_fit" : ld_fit } ,
+				        ck.dynamical_local_indexes , XX , Y = Y , n_jobs = n_jobs , ld_fit = ld_fit , n_repeat = n_repeat )
+##}}}
+
+def bench_fractals( records , sizes = (1,2,4) , n_repeat = 1 ):##{{{
+	for scale in sizes:
+		n = 1000 * scale
+		m = ckf.Mandelbrot( classic_set = "set0" , nx = n , ny = n )
+		record( records , { "name" : "Mandelbrot ({} x {})".format(n,n) , "sizes" : { "nx" : n , "ny" : n } ,
+		          "work" : n * n , "unit" : "pixels/s" } ,
+		        m.run , n_repeat = n_repeat )
+		
+		jul = ckf.Julia( classic_set = "set0" , nx = n , ny = n )
+		record( records , { "name" : "Julia ({} x {})".format(n,n) , "sizes" : { "nx" : n , "ny" : n } ,
+		          "work" : n * n , "unit" : "pixels/s" } ,
+		        jul.run , n_repeat = n_repeat )
+##}}}
+
+def compare( records , baseline , tolerance = 1.2 ):##{{{
+	"""
+	Print, for each case also found in baseline, the ratio of the best time
+	to the baseline one (> 1 is a slowdown), and the cases found in only one
+	of the two runs. Return the list of cases whose ratio exceeds tolerance.
+	"""
+	ref = { key(rec) : rec for rec in baseline }
+	new = { key(rec) : rec for rec in records }
+	print( "Comparison with version {}".format( baseline[0]["version"] if len(baseline) > 0 else "?" ) )
+	
+	regressions = []
+	for rec in records:
+		if key(rec) not in ref:
+			continue
+		ratio = rec["best"] / ref[key(rec)]["best"]
+		print( "{:<60}{:>10.2f}".format( label(rec) , ratio ) )
+		if ratio > tolerance:
+			regressions.append(rec)
+	
+	for rec in records:
+		if key(rec) not in ref:
+			print( "Only in this run: {}".format( label(rec) ) )
+	for rec in baseline:
+		if key(rec) not in new:
+			print( "Only in baseline: {}".format( label(rec) ) )
+	
+	for rec in regressions:
+		print( "Regression (> {}): {}".format( tolerance , label(rec) ) )
+	return regressions
+##}}}
+
+
+def run_all_benchmarks( sizes = (1,2,4) , l_n_jobs = (1,2,6) , l_ld_fit = ("mean","SDFC") , n_repeat = 3 , n_repeat_heavy = 1 ):##{{{
+	np.random.seed(42)
+	records = []
+	bench_orbits( records , sizes , n_repeat )
+	bench_local_dimension( records , sizes , l_n_jobs , l_ld_fit , n_repeat_heavy )
+	bench_fractals( records , sizes , n_repeat_heavy )
+	return records
+##}}}
+
+
+##########
+## main ##
+##########
+
+if __name__ == "__main__":
+	
+	## Start by print version number
+	print(ck.__version__)
+	
+	## Arguments
+	parser = argparse.ArgumentParser( description = "Benchmarks of CDSK" )
+	parser.add_argument( "--sizes"    , type = int , nargs = "+" , default = [1,2,4] , help = "Scale factors of the problem sizes" )
+	parser.add_argument( "--n_jobs"   , type = int , nargs = "+" , default = [1,2,6] , help = "Values of n_jobs for the local indexes" )
+	parser.add_argument( "--ld_fit"   , nargs = "+" , default = ["mean","SDFC"] , help = "Values of ld_fit for dynamical_local_indexes" )
+	parser.add_argument( "--n_repeat" , type = int , default = 3 , help = "Timed calls per orbit case" )
+	parser.add_argument( "--n_repeat_heavy" , type = int , default = 1 , help = "Timed calls per local dimension and fractal case" )
+	parser.add_argument( "--output"   , default = None , help = "JSON output, default output/benchmark_<version>.json" )
+	parser.add_argument( "--baseline" , default = None , help = "JSON output of a previous run to compare with" )
+	parser.add_argument( "--tolerance" , type = float , default = 1.2 , help = "Largest accepted ratio of best times to the baseline" )
+	args = parser.parse_args()
+	
+	## Now benchmarks
+	records = run_all_benchmarks( args.sizes , args.n_jobs , args.ld_fit , args.n_repeat , args.n_repeat_heavy )
+	
+	## Save
+	ofile = args.output
+	if ofile is None:
+		if not os.path.isdir("output"):
+			os.makedirs("output")
+		ofile = os.path.join( "output" , "benchmark_{}.json".format(ck.__version__) )
+	with open( ofile , "w" ) as f:
+		json.dump( records , f , indent = 1 )
+	
+	## Compare
+	if args.baseline is not None:
+		with open(args.baseline) as f:
+			regressions = compare( records , json.load(f) , args.tolerance )
+		if len(regressions) > 0:
+			sys.exit(1)
+	
+	print("Done")
+